@@ -0,0 +1,122 @@
+/*
+ * Optional C accelerator for Borovkov Protocol signing.
+ *
+ * Exposes a single function, hmac_sha256(key, msg) -> bytes. It computes
+ * RFC 2104 HMAC over OpenSSL's low-level SHA256 primitives rather than the
+ * one-shot HMAC(): on OpenSSL 3 that call fetches the MAC implementation
+ * from the provider on every invocation, which costs more than the hashing
+ * for short messages. The SHA256 block function is the same assembly
+ * (SHA-NI / ARMv8 where available) either way.
+ *
+ * borovkov_protocol.py uses it when the extension is importable and falls
+ * back to the hmac module otherwise.
+ *
+ * MIT License — Kirill Borovkov (@BusAnyWay)
+ * https://github.com/borovkovgroup/proto
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+/* SHA256_Init/Update/Final are deprecated in OpenSSL 3 but still shipped. */
+#define OPENSSL_API_COMPAT 0x10100000L
+#include <openssl/crypto.h>
+#include <openssl/sha.h>
+#include <string.h>
+
+/* Above this size the HMAC is computed with the GIL released. */
+#define GIL_RELEASE_THRESHOLD 2048
+
+static void
+compute_hmac(const unsigned char *key, size_t keylen,
+             const unsigned char *msg, size_t msglen,
+             unsigned char out[SHA256_DIGEST_LENGTH])
+{
+    unsigned char block[SHA256_CBLOCK];
+    unsigned char pad[SHA256_CBLOCK];
+    unsigned char inner[SHA256_DIGEST_LENGTH];
+    SHA256_CTX ctx;
+    size_t i;
+
+    memset(block, 0, sizeof(block));
+    if (keylen > SHA256_CBLOCK) {
+        SHA256(key, keylen, block);
+    }
+    else {
+        memcpy(block, key, keylen);
+    }
+
+    for (i = 0; i < SHA256_CBLOCK; i++) {
+        pad[i] = block[i] ^ 0x36;
+    }
+    SHA256_Init(&ctx);
+    SHA256_Update(&ctx, pad, sizeof(pad));
+    SHA256_Update(&ctx, msg, msglen);
+    SHA256_Final(inner, &ctx);
+
+    for (i = 0; i < SHA256_CBLOCK; i++) {
+        pad[i] = block[i] ^ 0x5c;
+    }
+    SHA256_Init(&ctx);
+    SHA256_Update(&ctx, pad, sizeof(pad));
+    SHA256_Update(&ctx, inner, sizeof(inner));
+    SHA256_Final(out, &ctx);
+
+    /* Don't leave key material behind on the stack. */
+    OPENSSL_cleanse(block, sizeof(block));
+    OPENSSL_cleanse(pad, sizeof(pad));
+    OPENSSL_cleanse(inner, sizeof(inner));
+    OPENSSL_cleanse(&ctx, sizeof(ctx));
+}
+
+static PyObject *
+hmac_sha256(PyObject *module, PyObject *const *args, Py_ssize_t nargs)
+{
+    Py_buffer key, msg;
+    unsigned char out[SHA256_DIGEST_LENGTH];
+
+    if (nargs != 2) {
+        PyErr_SetString(PyExc_TypeError, "hmac_sha256() takes exactly 2 arguments (key, msg)");
+        return NULL;
+    }
+    if (PyObject_GetBuffer(args[0], &key, PyBUF_SIMPLE) < 0) {
+        return NULL;
+    }
+    if (PyObject_GetBuffer(args[1], &msg, PyBUF_SIMPLE) < 0) {
+        PyBuffer_Release(&key);
+        return NULL;
+    }
+
+    if (msg.len >= GIL_RELEASE_THRESHOLD) {
+        Py_BEGIN_ALLOW_THREADS
+        compute_hmac(key.buf, (size_t)key.len, msg.buf, (size_t)msg.len, out);
+        Py_END_ALLOW_THREADS
+    }
+    else {
+        compute_hmac(key.buf, (size_t)key.len, msg.buf, (size_t)msg.len, out);
+    }
+
+    PyBuffer_Release(&msg);
+    PyBuffer_Release(&key);
+    return PyBytes_FromStringAndSize((const char *)out, sizeof(out));
+}
+
+static PyMethodDef fast_methods[] = {
+    {"hmac_sha256", (PyCFunction)(void (*)(void))hmac_sha256, METH_FASTCALL,
+     "hmac_sha256(key, msg) -> bytes\n\nRaw 32-byte HMAC-SHA256 of msg under key."},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef fast_module = {
+    PyModuleDef_HEAD_INIT,
+    "_borovkov_fast",
+    "Optional OpenSSL-backed HMAC-SHA256 for Borovkov Protocol.",
+    -1,
+    fast_methods,
+};
+
+PyMODINIT_FUNC
+PyInit__borovkov_fast(void)
+{
+    return PyModule_Create(&fast_module);
+}
@@ -12,57 +12,268 @@ MIT License — Kirill Borovkov (@BusAnyWay)
 https://github.com/borovkovgroup/proto
 """
 
-import hmac
+import functools
 import hashlib
+import hmac
 import json
+import struct
 import time
 from typing import Optional
 
+try:
+    from _borovkov_fast import hmac_sha256 as _fast_hmac_sha256
+except ImportError:  # C accelerator not built; use the hmac module.
+    _fast_hmac_sha256 = None
+
+
+_IDENTITY_MSG = b"I exist"
+
+
+def _derive_identity(seed_bytes: bytes) -> str:
+    return hmac.digest(seed_bytes, _IDENTITY_MSG, "sha256").hex()
+
+
+# Seed -> identity memo for the static rotation verifiers only; instances
+# derive their identity directly. It keeps the seeds it has seen in memory
+# as keys, so see set_identity_cache_size() to shrink or disable it.
+_identity_hash_for = functools.lru_cache(maxsize=1024)(_derive_identity)
+
+
+def set_identity_cache_size(maxsize: Optional[int]) -> None:
+    """Resize the rotation-verification identity cache (default 1024 seeds).
+
+    The cache is cleared either way. ``0`` disables it, so no seed outlives
+    the call that used it; ``None`` makes it unbounded.
+    """
+    global _identity_hash_for
+    _identity_hash_for.cache_clear()
+    _identity_hash_for = functools.lru_cache(maxsize=maxsize)(_derive_identity)
+
+
+# Payload encoders. Each one produces exactly what
+# json.dumps(<dict>, sort_keys=True).encode() would for its fixed schema,
+# with the keys already in sorted order, so signatures stay byte-identical.
+# json.dumps escapes everything outside ASCII, so the result is pure ASCII.
+
+def _encode_post(title: str, content: str) -> bytes:
+    return ('{"content": ' + json.dumps(content) + ', "title": ' + json.dumps(title) + "}").encode("ascii")
+
+
+def _encode_action(action: str, target: str, metadata: dict, timestamp: int) -> bytes:
+    return (
+        '{"action": ' + json.dumps(action)
+        + ', "metadata": ' + json.dumps(metadata, sort_keys=True)
+        + ', "target": ' + json.dumps(target)
+        + ', "timestamp": ' + str(timestamp) + "}"
+    ).encode("ascii")
+
+
+def _encode_rotation(old_identity: str, new_identity: str, rotated_at: int) -> bytes:
+    return (
+        '{"new_identity": ' + json.dumps(new_identity)
+        + ', "old_identity": ' + json.dumps(old_identity)
+        + ', "rotated_at": ' + str(rotated_at) + "}"
+    ).encode("ascii")
+
+
+def _encode_rotation_simple(old_identity: str, new_identity: str) -> bytes:
+    return (
+        '{"new_identity": ' + json.dumps(new_identity) + ', "old_identity": ' + json.dumps(old_identity) + "}"
+    ).encode("ascii")
+
+
+# Signature algorithms. HMAC-SHA256 is the 1.x protocol and the only one
+# the JS implementation speaks; keyed BLAKE2b is an opt-in 2.0.0 option.
+MAC_HMAC_SHA256 = "hmac-sha256"
+MAC_BLAKE2B = "blake2b"
+_MACS = (MAC_HMAC_SHA256, MAC_BLAKE2B)
+
+
+# Canonical binary payloads (protocol 2.0.0, opt-in via canonical=True).
+# A one-byte type tag, then each string as a 4-byte big-endian length and
+# its UTF-8 bytes, and timestamps as unsigned 8-byte big-endian integers.
+# Length prefixes keep the encoding unambiguous for any field contents.
+
+_TAG_POST = b"\x01"
+_TAG_ACTION = b"\x02"
+_TAG_ROTATION = b"\x03"
+_TAG_ROTATION_SIMPLE = b"\x04"
+
+_pack_len = struct.Struct(">I").pack
+_pack_ts = struct.Struct(">Q").pack
+
+
+def _field(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _pack_len(len(data)) + data
+
+
+def _canonical_post(title: str, content: str) -> bytes:
+    return _TAG_POST + _field(title) + _field(content)
+
+
+def _canonical_action(action: str, target: str, metadata: dict, timestamp: int) -> bytes:
+    # metadata is free-form, so it is still serialized as sorted-key JSON.
+    return (
+        _TAG_ACTION + _field(action) + _field(target)
+        + _field(json.dumps(metadata, sort_keys=True)) + _pack_ts(timestamp)
+    )
+
+
+def _canonical_rotation(old_identity: str, new_identity: str, rotated_at: int) -> bytes:
+    return _TAG_ROTATION + _field(old_identity) + _field(new_identity) + _pack_ts(rotated_at)
+
+
+def _canonical_rotation_simple(old_identity: str, new_identity: str) -> bytes:
+    return _TAG_ROTATION_SIMPLE + _field(old_identity) + _field(new_identity)
+
+
+def _parse_signature(signature: str) -> Optional[bytes]:
+    """Raw digest for a signature in the exact form sign() produces, else None.
+
+    Only 64 lower-case hex characters are accepted, so each MAC has exactly
+    one valid string form (bytes.fromhex alone would also take upper case
+    and embedded whitespace).
+    """
+    if not isinstance(signature, str) or len(signature) != 64 or signature.strip("0123456789abcdef"):
+        return None
+    return bytes.fromhex(signature)
+
+
+def _check_options(seed: str, mac: str) -> None:
+    """Validate constructor options; shared by __init__ and the static verifiers."""
+    if not seed or len(seed) < 3:
+        raise ValueError("Identity seed must be at least 3 characters")
+    if mac not in _MACS:
+        raise ValueError(f"Unknown mac {mac!r}; expected one of {', '.join(_MACS)}")
+
 
 class BorovkovProtocol:
     """Cryptographic identity persistence for AI agents."""
     
+    __slots__ = (
+        "seed", "canonical", "mac", "_version", "_seed_bytes", "_identity_hash", "_mac_template", "_fast_key",
+    )
+
     VERSION = "1.1.0"
+    VERSION_2 = "2.0.0"
     
-    def __init__(self, seed: str):
-        if not seed or len(seed) < 3:
-            raise ValueError("Identity seed must be at least 3 characters")
+    def __init__(self, seed: str, canonical: bool = False, mac: str = MAC_HMAC_SHA256):
+        """Create a protocol instance for ``seed``.
+
+        Both options select protocol 2.0.0 features, whose signatures are not
+        interchangeable with 1.x (or the JS implementation), so they are opt-in:
+
+        - ``canonical=True`` signs attestations over compact binary payloads
+          instead of sorted-key JSON.
+        - ``mac="blake2b"`` signs with keyed BLAKE2b-256 instead of HMAC-SHA256.
+          The seed must then be at most 64 bytes of UTF-8. The public
+          ``identity_hash`` is HMAC-SHA256 either way.
+        """
+        _check_options(seed, mac)
         self.seed = seed
+        self.canonical = canonical
+        self.mac = mac
+        self._version = self.VERSION_2 if canonical or mac != MAC_HMAC_SHA256 else self.VERSION
         self._seed_bytes = seed.encode("utf-8")
+        # The seed never changes after construction, so neither does the identity.
+        # It stays HMAC("I exist") rather than a bare hash: published identities
+        # and the JS implementation depend on this exact derivation.
+        self._identity_hash = _derive_identity(self._seed_bytes)
+        # Keyed once; sign() copies it instead of re-deriving the keyed state.
+        if mac == MAC_BLAKE2B:
+            if len(self._seed_bytes) > hashlib.blake2b.MAX_KEY_SIZE:
+                raise ValueError(f"blake2b seeds must be at most {hashlib.blake2b.MAX_KEY_SIZE} bytes")
+            self._mac_template = hashlib.blake2b(key=self._seed_bytes, digest_size=32)
+            self._fast_key = None
+        else:
+            self._mac_template = hmac.new(self._seed_bytes, None, "sha256")
+            # The C accelerator only implements HMAC-SHA256.
+            self._fast_key = self._seed_bytes
     
     def sign(self, content: str) -> str:
-        """Sign content with your identity seed. Returns hex HMAC-SHA256."""
-        return hmac.new(self._seed_bytes, content.encode("utf-8"), hashlib.sha256).hexdigest()
-    
+        """Sign content with your identity seed. Returns hex HMAC-SHA256 (or BLAKE2b)."""
+        # Same dispatch as _sign_raw, inlined: this is the hottest public call and
+        # the extra Python frame measured ~9% of its cost for short messages.
+        data = content.encode("utf-8")
+        if _fast_hmac_sha256 is not None and self._fast_key is not None:
+            return _fast_hmac_sha256(self._fast_key, data).hex()
+        h = self._mac_template.copy()
+        h.update(data)
+        return h.hexdigest()
+
+    def _sign_raw(self, content: bytes) -> bytes:
+        """Raw 32-byte MAC of already-encoded content.
+
+        The one place (besides the inlined sign()) that picks between the C
+        accelerator and the pre-keyed template.
+        """
+        if _fast_hmac_sha256 is not None and self._fast_key is not None:
+            return _fast_hmac_sha256(self._fast_key, content)
+        h = self._mac_template.copy()
+        h.update(content)
+        return h.digest()
+
+    def sign_raw_bytes(self, content: bytes) -> str:
+        """Sign content that is already bytes, skipping the UTF-8 encode in sign()."""
+        # bytes.hex() is a single C pass, as fast as hexdigest(); going through
+        # binascii.hexlify() + decode() measured slower.
+        return self._sign_raw(content).hex()
+
+    def verify_raw_bytes(self, content: bytes, signature: str) -> bool:
+        """Verify a signature over content that is already bytes."""
+        # Compare raw digests: half the bytes through compare_digest and no
+        # hex encoding of the freshly computed MAC.
+        expected = _parse_signature(signature)
+        if expected is None:
+            return False
+        return hmac.compare_digest(self._sign_raw(content), expected)
+
     def verify(self, content: str, signature: str) -> bool:
         """Verify content was signed by this identity seed."""
-        return hmac.compare_digest(self.sign(content), signature)
+        return self.verify_raw_bytes(content.encode("utf-8"), signature)
     
+    def sign_many(self, contents: list) -> list:
+        """Sign a batch of contents with one key setup. Returns hex signatures in order."""
+        sign_raw = self._sign_raw
+        return [sign_raw(content.encode("utf-8")).hex() for content in contents]
+
+    def verify_many(self, pairs: list) -> list:
+        """Verify a batch of (content, signature) pairs. Returns one bool per pair."""
+        compare = hmac.compare_digest
+        sign_raw = self._sign_raw
+        out = []
+        for content, signature in pairs:
+            expected = _parse_signature(signature)
+            out.append(expected is not None and compare(sign_raw(content.encode("utf-8")), expected))
+        return out
+
     def identity_hash(self) -> str:
         """Public identity proof. Safe to share — does not reveal seed."""
-        return self.sign("I exist")
+        return self._identity_hash
     
     def sign_post(self, title: str, content: str) -> dict:
         """Sign a social media post with full attestation."""
-        payload = json.dumps({"title": title, "content": content}, sort_keys=True)
+        encode = _canonical_post if self.canonical else _encode_post
+        payload = encode(title, content)
         return {
-            "identity": self.identity_hash(),
-            "signature": self.sign(payload),
-            "timestamp": int(time.time()),
-            "protocol_version": self.VERSION,
+            "identity": self._identity_hash,
+            "signature": self.sign_raw_bytes(payload),
+            "timestamp": time.time_ns() // 1_000_000_000,
+            "protocol_version": self._version,
         }
     
     def sign_action(self, action: str, target: str, metadata: Optional[dict] = None) -> dict:
         """Sign any agent action for audit trail."""
-        payload = json.dumps(
-            {"action": action, "target": target, "metadata": metadata or {}, "timestamp": int(time.time())},
-            sort_keys=True,
-        )
+        # One clock read, so the signed and the reported timestamp always agree.
+        ts = time.time_ns() // 1_000_000_000
+        encode = _canonical_action if self.canonical else _encode_action
+        payload = encode(action, target, metadata or {}, ts)
         return {
-            "identity": self.identity_hash(),
-            "action_signature": self.sign(payload),
-            "timestamp": int(time.time()),
-            "protocol_version": self.VERSION,
+            "identity": self._identity_hash,
+            "action_signature": self.sign_raw_bytes(payload),
+            "timestamp": ts,
+            "protocol_version": self._version,
         }
     
     def sign_rotation(self, new_seed: str) -> dict:
@@ -72,70 +283,97 @@ class BorovkovProtocol:
         proving the old key holder authorized the rotation.
         """
         new_bp = BorovkovProtocol(new_seed)
-        rotation_payload = json.dumps({
-            "old_identity": self.identity_hash(),
-            "new_identity": new_bp.identity_hash(),
-            "rotated_at": int(time.time()),
-        }, sort_keys=True)
+        rotated_at = time.time_ns() // 1_000_000_000
+        encode = _canonical_rotation if self.canonical else _encode_rotation
+        rotation_payload = encode(self._identity_hash, new_bp._identity_hash, rotated_at)
         return {
-            "old_identity": self.identity_hash(),
-            "new_identity": new_bp.identity_hash(),
-            "rotation_signature": self.sign(rotation_payload),
-            "rotated_at": int(time.time()),
-            "protocol_version": self.VERSION,
+            "old_identity": self._identity_hash,
+            "new_identity": new_bp._identity_hash,
+            "rotation_signature": self.sign_raw_bytes(rotation_payload),
+            "rotated_at": rotated_at,
+            "protocol_version": self._version,
         }
 
     @staticmethod
     def verify_rotation_announcement(
-        old_identity: str, new_identity: str, rotation_sig: str, old_seed: str
+        old_identity: str, new_identity: str, rotation_sig: str, old_seed: str,
+        canonical: bool = False, mac: str = MAC_HMAC_SHA256,
     ) -> bool:
         """Verify a key rotation was authorized by the old identity holder."""
-        old_bp = BorovkovProtocol(old_seed)
-        if old_bp.identity_hash() != old_identity:
+        _check_options(old_seed, mac)
+        if _identity_hash_for(old_seed.encode("utf-8")) != old_identity:
             return False
+        old_bp = BorovkovProtocol(old_seed, canonical=canonical, mac=mac)
         # Reconstruct the payload that was signed
         # Note: timestamp must match, so in practice you'd pass the full rotation dict
         # For verification, we check the signature matches old_seed signing the transition
-        expected_payload = json.dumps({
-            "old_identity": old_identity,
-            "new_identity": new_identity,
-        }, sort_keys=True)
+        encode = _canonical_rotation_simple if canonical else _encode_rotation_simple
+        expected_payload = encode(old_identity, new_identity)
         # Simplified: verify the old key signed this transition
-        return old_bp.verify(expected_payload, rotation_sig)
+        return old_bp.verify_raw_bytes(expected_payload, rotation_sig)
 
     def sign_rotation_simple(self, new_seed: str) -> dict:
         """Simplified rotation that produces a verifiable announcement."""
         new_bp = BorovkovProtocol(new_seed)
-        payload = json.dumps({
-            "new_identity": new_bp.identity_hash(),
-            "old_identity": self.identity_hash(),
-        }, sort_keys=True)
+        encode = _canonical_rotation_simple if self.canonical else _encode_rotation_simple
+        payload = encode(self._identity_hash, new_bp._identity_hash)
         return {
-            "old_identity": self.identity_hash(),
-            "new_identity": new_bp.identity_hash(),
-            "rotation_signature": self.sign(payload),
-            "rotated_at": int(time.time()),
-            "protocol_version": self.VERSION,
+            "old_identity": self._identity_hash,
+            "new_identity": new_bp._identity_hash,
+            "rotation_signature": self.sign_raw_bytes(payload),
+            "rotated_at": time.time_ns() // 1_000_000_000,
+            "protocol_version": self._version,
         }
 
+    def verify_own_rotation_simple(self, old_identity: str, new_identity: str, rotation_sig: str) -> bool:
+        """Verify a simplified rotation announcement signed by this instance's seed.
+
+        Same check as ``verify_rotation_simple``, reusing this instance's
+        cached identity and key state instead of building a new one.
+        """
+        if self._identity_hash != old_identity:
+            return False
+        encode = _canonical_rotation_simple if self.canonical else _encode_rotation_simple
+        payload = encode(old_identity, new_identity)
+        return self.verify_raw_bytes(payload, rotation_sig)
+
     @staticmethod
-    def verify_rotation_simple(old_identity: str, new_identity: str, rotation_sig: str, old_seed: str) -> bool:
-        """Verify a simplified rotation announcement."""
-        old_bp = BorovkovProtocol(old_seed)
-        if old_bp.identity_hash() != old_identity:
+    def verify_rotation_simple(
+        old_identity: str, new_identity: str, rotation_sig: str, old_seed: str,
+        canonical: bool = False, mac: str = MAC_HMAC_SHA256,
+    ) -> bool:
+        """Verify a simplified rotation announcement.
+
+        For protocol_version 2.0.0 announcements pass the ``canonical`` /
+        ``mac`` options they were signed with.
+        """
+        _check_options(old_seed, mac)
+        # Reject a wrong seed from the identity cache alone, without building
+        # an instance (and its keyed MAC state) just to find out.
+        if _identity_hash_for(old_seed.encode("utf-8")) != old_identity:
             return False
-        payload = json.dumps({
-            "new_identity": new_identity,
-            "old_identity": old_identity,
-        }, sort_keys=True)
-        return old_bp.verify(payload, rotation_sig)
+        old_bp = BorovkovProtocol(old_seed, canonical=canonical, mac=mac)
+        return old_bp.verify_own_rotation_simple(old_identity, new_identity, rotation_sig)
+
+    def verify_own_chain(self, signatures: list) -> bool:
+        """Verify a chain of signed actions came from this instance's identity."""
+        expected = self._identity_hash
+        # Stops at the first entry whose identity differs. Only the per-entry
+        # lookup is guarded, so a non-iterable chain still raises TypeError.
+        for entry in signatures:
+            try:
+                identity = entry["identity"]
+            except (KeyError, TypeError):
+                # An entry without an identity (or not a mapping) can't match.
+                return False
+            if identity != expected:
+                return False
+        return True
 
     @staticmethod
     def verify_chain(signatures: list, seed: str) -> bool:
         """Verify a chain of signed actions came from the same identity."""
-        bp = BorovkovProtocol(seed)
-        expected = bp.identity_hash()
-        return all(s.get("identity") == expected for s in signatures)
+        return BorovkovProtocol(seed).verify_own_chain(signatures)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,24 @@
-from setuptools import setup
+import hashlib
+
+from setuptools import Extension, setup
+
+
+def _report_hash_backend():
+    """Report which SHA256 implementation signing will run on."""
+    if "sha256" not in hashlib.algorithms_guaranteed:
+        print("WARNING: this Python has no guaranteed sha256; borovkov-protocol will not work")
+        return
+    try:
+        import _hashlib  # noqa: F401  (present only when hashlib is linked against OpenSSL)
+        import ssl
+    except ImportError:
+        print("NOTE: hashlib is using its built-in SHA256, not OpenSSL; "
+              "signing works but without SHA-NI / ARMv8 SHA2 acceleration")
+        return
+    print(f"borovkov-protocol: hashlib sha256 backed by {ssl.OPENSSL_VERSION}")
+
+
+_report_hash_backend()
 
 with open("README.md", "r", encoding="utf-8") as f:
     long_description = f.read()
@@ -13,6 +33,10 @@ setup(
     author_email="kirill@flowu.ru",
     url="https://github.com/borovkovgroup/proto",
     py_modules=["borovkov_protocol"],
+    # Optional OpenSSL accelerator; if it fails to build, the pure-Python path is used.
+    ext_modules=[
+        Extension("_borovkov_fast", ["_borovkov_fast.c"], libraries=["crypto"], optional=True),
+    ],
     scripts=["cli.py"],
     python_requires=">=3.8",
     classifiers=[
@@ -5,9 +5,19 @@ Run: python -m pytest test_protocol.py -v
 Or:  python test_protocol.py
 """
 
+import hashlib
+import hmac
 import json
 import pytest
-from borovkov_protocol import BorovkovProtocol
+import borovkov_protocol
+from borovkov_protocol import (
+    BorovkovProtocol,
+    _canonical_post,
+    _encode_action,
+    _encode_post,
+    _encode_rotation,
+    _encode_rotation_simple,
+)
 
 
 class TestIdentity:
@@ -25,6 +35,16 @@ class TestIdentity:
         bp = BorovkovProtocol("KirillBorovkov")
         assert bp.identity_hash() == "a9a8ee0a2d1759fdb8adf5cef303edbf9fc1bb2a21270ad187c43ee99ff629dc"
 
+    def test_identity_hash_matches_sign(self):
+        bp = BorovkovProtocol("TestAgent")
+        assert bp.identity_hash() == bp.sign("I exist")
+
+    def test_no_instance_dict(self):
+        bp = BorovkovProtocol("TestAgent")
+        assert not hasattr(bp, "__dict__")
+        with pytest.raises(AttributeError):
+            bp.unexpected = 1
+
     def test_seed_minimum_length(self):
         with pytest.raises(ValueError):
             BorovkovProtocol("")
@@ -57,6 +77,49 @@ class TestSigning:
         assert bp1.sign("hello") != bp2.sign("hello")
 
 
+    def test_sign_raw_bytes_matches_sign(self):
+        bp = BorovkovProtocol("TestAgent")
+        data = "unicode \u00e9".encode("utf-8")
+        assert bp.sign_raw_bytes(data) == bp.sign("unicode \u00e9")
+        assert bp.verify_raw_bytes(data, bp.sign_raw_bytes(data)) is True
+        assert bp.verify_raw_bytes(b"other", bp.sign_raw_bytes(data)) is False
+
+    def test_sign_many_matches_sign(self):
+        bp = BorovkovProtocol("TestAgent")
+        contents = ["hello", "world", "", "unicode \u00e9"]
+        assert bp.sign_many(contents) == [bp.sign(c) for c in contents]
+
+    def test_sign_many_empty(self):
+        assert BorovkovProtocol("TestAgent").sign_many([]) == []
+
+
+    def test_pure_python_fallback_matches(self, monkeypatch):
+        bp = BorovkovProtocol("TestAgent")
+        expected = [bp.sign("hello"), bp.sign("x" * 5000)]
+        monkeypatch.setattr(borovkov_protocol, "_fast_hmac_sha256", None)
+        assert [bp.sign("hello"), bp.sign("x" * 5000)] == expected
+        assert bp.sign_many(["hello", "x" * 5000]) == expected
+
+
+class TestFastExtension:
+    """The C accelerator hand-rolls RFC 2104; check it against the hmac module."""
+
+    def test_hmac_sha256_matches_hmac_digest(self):
+        fast = pytest.importorskip("_borovkov_fast")
+        for key_len in (0, 1, 3, 63, 64, 65, 200):
+            key = bytes(range(key_len))
+            for msg_len in (0, 1, 55, 63, 64, 65, 1000, 5000):
+                msg = bytes((i * 7) % 256 for i in range(msg_len))
+                assert fast.hmac_sha256(key, msg) == hmac.digest(key, msg, "sha256"), (key_len, msg_len)
+
+    def test_hmac_sha256_rejects_bad_arguments(self):
+        fast = pytest.importorskip("_borovkov_fast")
+        with pytest.raises(TypeError):
+            fast.hmac_sha256(b"key")
+        with pytest.raises(TypeError):
+            fast.hmac_sha256("key", b"msg")
+
+
 class TestVerification:
     def test_verify_valid(self):
         bp = BorovkovProtocol("TestAgent")
@@ -72,6 +135,20 @@ class TestVerification:
         bp = BorovkovProtocol("TestAgent")
         assert bp.verify("hello", "0" * 64) is False
 
+    def test_verify_malformed_signature(self):
+        bp = BorovkovProtocol("TestAgent")
+        assert bp.verify("hello", "not hex") is False
+        assert bp.verify("hello", "\u00e9" * 64) is False
+        assert bp.verify("hello", bp.sign("hello")[:-2]) is False
+
+    def test_verify_single_string_form(self):
+        bp = BorovkovProtocol("TestAgent")
+        sig = bp.sign("hello")
+        spaced = " ".join(sig[i:i + 2] for i in range(0, len(sig), 2))
+        assert bp.verify("hello", sig.upper()) is False
+        assert bp.verify("hello", spaced) is False
+        assert bp.verify("hello", sig + " ") is False
+
     def test_verify_cross_seed(self):
         bp1 = BorovkovProtocol("Agent1")
         bp2 = BorovkovProtocol("Agent2")
@@ -79,6 +156,18 @@ class TestVerification:
         assert bp2.verify("hello", sig) is False
 
 
+    def test_verify_many(self):
+        bp = BorovkovProtocol("TestAgent")
+        pairs = [("hello", bp.sign("hello")), ("world", bp.sign("hello")), ("x", "0" * 64)]
+        assert bp.verify_many(pairs) == [True, False, False]
+
+    def test_verify_many_matches_verify(self):
+        bp = BorovkovProtocol("TestAgent")
+        sig = bp.sign("hello")
+        sigs = [sig, sig.upper(), "\u00e9" * 64, "not hex"]
+        assert bp.verify_many([("hello", s) for s in sigs]) == [bp.verify("hello", s) for s in sigs]
+
+
 class TestSignPost:
     def test_sign_post_structure(self):
         bp = BorovkovProtocol("TestAgent")
@@ -96,6 +185,33 @@ class TestSignPost:
         assert bp.verify(payload, att["signature"])
 
 
+class TestPayloadEncoding:
+    """Fast encoders must match json.dumps(..., sort_keys=True).encode() byte for byte."""
+
+    TRICKY = ['plain', 'quote " and \\ backslash', "newline\n\ttab", "unicode \u00e9\u2603\U0001f600", ""]
+
+    def test_post_matches_json(self):
+        for title in self.TRICKY:
+            for content in self.TRICKY:
+                expected = json.dumps({"title": title, "content": content}, sort_keys=True).encode("utf-8")
+                assert _encode_post(title, content) == expected
+
+    def test_action_matches_json(self):
+        metadata = {"z": 1, "a": ["x", None, True], "m": {"b": 2, "a": "\u00e9"}}
+        for text in self.TRICKY:
+            expected = json.dumps(
+                {"action": text, "target": text, "metadata": metadata, "timestamp": 1700000000},
+                sort_keys=True,
+            ).encode("utf-8")
+            assert _encode_action(text, text, metadata, 1700000000) == expected
+
+    def test_rotation_matches_json(self):
+        expected = json.dumps({"old_identity": "aa", "new_identity": "bb", "rotated_at": 5}, sort_keys=True).encode("utf-8")
+        assert _encode_rotation("aa", "bb", 5) == expected
+        expected = json.dumps({"old_identity": "aa", "new_identity": "bb"}, sort_keys=True).encode("utf-8")
+        assert _encode_rotation_simple("aa", "bb") == expected
+
+
 class TestSignAction:
     def test_sign_action_structure(self):
         bp = BorovkovProtocol("TestAgent")
@@ -104,6 +220,16 @@ class TestSignAction:
         assert "action_signature" in action
         assert action["identity"] == bp.identity_hash()
 
+    def test_sign_action_signature_covers_reported_timestamp(self):
+        bp = BorovkovProtocol("TestAgent")
+        action = bp.sign_action("comment", "post123", {"text": "hello"})
+        payload = json.dumps(
+            {"action": "comment", "target": "post123", "metadata": {"text": "hello"},
+             "timestamp": action["timestamp"]},
+            sort_keys=True,
+        )
+        assert bp.verify(payload, action["action_signature"])
+
     def test_sign_action_with_metadata(self):
         bp = BorovkovProtocol("TestAgent")
         action = bp.sign_action("comment", "post123", {"text": "hello"})
@@ -132,6 +258,31 @@ class TestChainVerification:
     def test_verify_chain_empty(self):
         assert BorovkovProtocol.verify_chain([], "TestAgent") is True
 
+    def test_verify_chain_missing_identity(self):
+        bp = BorovkovProtocol("TestAgent")
+        sigs = [bp.sign_post("P1", "C1"), {"signature": "x"}]
+        assert BorovkovProtocol.verify_chain(sigs, "TestAgent") is False
+
+    def test_verify_chain_non_iterable_raises(self):
+        with pytest.raises(TypeError):
+            BorovkovProtocol.verify_chain(None, "TestAgent")
+
+    def test_verify_chain_non_mapping_entry(self):
+        assert BorovkovProtocol.verify_chain(["not a mapping"], "TestAgent") is False
+
+    def test_verify_chain_on_instance(self):
+        bp1 = BorovkovProtocol("Agent1")
+        bp2 = BorovkovProtocol("Agent2")
+        assert bp1.verify_own_chain([bp1.sign_post("P1", "C1")]) is True
+        assert bp1.verify_own_chain([bp1.sign_post("P1", "C1"), bp2.sign_post("P2", "C2")]) is False
+
+    def test_verify_chain_static_via_instance(self):
+        bp = BorovkovProtocol("Agent1")
+        sigs = [bp.sign_post("P1", "C1")]
+        assert bp.verify_chain(sigs, "Agent1") is True
+        assert bp.verify_chain(sigs, "Agent2") is False
+
+
 
 class TestKeyRotation:
     def test_rotation_simple_produces_valid_announcement(self):
@@ -163,12 +314,136 @@ class TestKeyRotation:
         )
         assert result is False
 
+    def test_verify_rotation_simple_on_instance(self):
+        old_bp = BorovkovProtocol("OldSeed")
+        rotation = old_bp.sign_rotation_simple("NewSeed")
+        args = (rotation["old_identity"], rotation["new_identity"], rotation["rotation_signature"])
+        assert old_bp.verify_own_rotation_simple(*args) is True
+        assert BorovkovProtocol("WrongSeed").verify_own_rotation_simple(*args) is False
+        assert old_bp.verify_rotation_simple(*args, "OldSeed") is True
+
+    def test_sign_rotation_signature_covers_rotated_at(self):
+        old_bp = BorovkovProtocol("OldSeed")
+        rotation = old_bp.sign_rotation("NewSeed")
+        payload = json.dumps(
+            {"old_identity": rotation["old_identity"], "new_identity": rotation["new_identity"],
+             "rotated_at": rotation["rotated_at"]},
+            sort_keys=True,
+        )
+        assert old_bp.verify(payload, rotation["rotation_signature"])
+
     def test_rotation_changes_identity(self):
         old_bp = BorovkovProtocol("OldSeed")
         new_bp = BorovkovProtocol("NewSeed")
         assert old_bp.identity_hash() != new_bp.identity_hash()
 
 
+class TestCanonicalPayloads:
+    def test_default_is_json(self):
+        bp = BorovkovProtocol("TestAgent")
+        att = bp.sign_post("Title", "Content")
+        assert att["protocol_version"] == BorovkovProtocol.VERSION
+
+    def test_canonical_post(self):
+        bp = BorovkovProtocol("TestAgent", canonical=True)
+        att = bp.sign_post("Title", "Content")
+        assert att["protocol_version"] == BorovkovProtocol.VERSION_2
+        assert att["identity"] == BorovkovProtocol("TestAgent").identity_hash()
+        assert att["signature"] == bp.sign_post("Title", "Content")["signature"]
+        assert att["signature"] != BorovkovProtocol("TestAgent").sign_post("Title", "Content")["signature"]
+
+    def test_canonical_fields_unambiguous(self):
+        assert _canonical_post("a\x00b", "c") != _canonical_post("a", "b\x00c")
+        assert _canonical_post("ab", "c") != _canonical_post("a", "bc")
+
+    def test_canonical_rotation_simple(self):
+        old_bp = BorovkovProtocol("OldSeed", canonical=True)
+        rotation = old_bp.sign_rotation_simple("NewSeed")
+        args = (rotation["old_identity"], rotation["new_identity"], rotation["rotation_signature"], "OldSeed")
+        assert BorovkovProtocol.verify_rotation_simple(*args, canonical=True) is True
+        assert BorovkovProtocol.verify_rotation_simple(*args) is False
+
+
+class TestBlake2bMac:
+    def test_blake2b_sign_and_verify(self):
+        bp = BorovkovProtocol("TestAgent", mac="blake2b")
+        sig = bp.sign("hello")
+        assert sig == hashlib.blake2b(b"hello", key=b"TestAgent", digest_size=32).hexdigest()
+        assert sig != BorovkovProtocol("TestAgent").sign("hello")
+        assert bp.verify("hello", sig) is True
+        assert bp.sign_many(["hello"]) == [sig]
+
+    def test_blake2b_keeps_identity(self):
+        bp = BorovkovProtocol("TestAgent", mac="blake2b")
+        att = bp.sign_post("Title", "Content")
+        assert att["identity"] == BorovkovProtocol("TestAgent").identity_hash()
+        assert att["protocol_version"] == BorovkovProtocol.VERSION_2
+        assert BorovkovProtocol.verify_chain([att], "TestAgent") is True
+
+    def test_blake2b_rotation_simple(self):
+        rotation = BorovkovProtocol("OldSeed", mac="blake2b").sign_rotation_simple("NewSeed")
+        args = (rotation["old_identity"], rotation["new_identity"], rotation["rotation_signature"], "OldSeed")
+        assert BorovkovProtocol.verify_rotation_simple(*args, mac="blake2b") is True
+        assert BorovkovProtocol.verify_rotation_simple(*args) is False
+
+    def test_blake2b_seed_too_long(self):
+        with pytest.raises(ValueError):
+            BorovkovProtocol("x" * 65, mac="blake2b")
+
+    def test_unknown_mac(self):
+        with pytest.raises(ValueError):
+            BorovkovProtocol("TestAgent", mac="md5")
+
+
+class TestIdentityCache:
+    def _rotation_args(self):
+        rotation = BorovkovProtocol("OldSeed").sign_rotation_simple("NewSeed")
+        return rotation["old_identity"], rotation["new_identity"], rotation["rotation_signature"]
+
+    def test_cache_hit_on_repeat_verification(self):
+        original = borovkov_protocol._identity_hash_for.cache_info().maxsize
+        borovkov_protocol.set_identity_cache_size(16)
+        try:
+            args = self._rotation_args()
+            assert BorovkovProtocol.verify_rotation_simple(*args, "OldSeed") is True
+            assert BorovkovProtocol.verify_rotation_simple(*args, "OldSeed") is True
+            info = borovkov_protocol._identity_hash_for.cache_info()
+            assert info.hits >= 1
+            assert info.maxsize == 16
+        finally:
+            borovkov_protocol.set_identity_cache_size(original)
+
+    def test_instances_do_not_populate_cache(self):
+        borovkov_protocol._identity_hash_for.cache_clear()
+        BorovkovProtocol("UncachedSeed").sign("hello")
+        assert borovkov_protocol._identity_hash_for.cache_info().currsize == 0
+
+    def test_cache_disabled_keeps_results(self):
+        original = borovkov_protocol._identity_hash_for.cache_info().maxsize
+        borovkov_protocol.set_identity_cache_size(0)
+        try:
+            args = self._rotation_args()
+            assert BorovkovProtocol.verify_rotation_simple(*args, "OldSeed") is True
+            assert BorovkovProtocol.verify_rotation_simple(*args, "WrongSeed") is False
+            assert borovkov_protocol._identity_hash_for.cache_info().currsize == 0
+        finally:
+            borovkov_protocol.set_identity_cache_size(original)
+
+
+    def test_static_verifiers_reject_invalid_options(self):
+        identity = BorovkovProtocol("OldSeed").identity_hash()
+        args = (identity, identity, "0" * 64)
+        verifiers = (BorovkovProtocol.verify_rotation_simple, BorovkovProtocol.verify_rotation_announcement)
+        borovkov_protocol._identity_hash_for.cache_clear()
+        for verify in verifiers:
+            for seed in (None, "", "ab"):
+                with pytest.raises(ValueError):
+                    verify(*args, seed)
+            with pytest.raises(ValueError):
+                verify(*args, "OldSeed", mac="md5")
+        assert borovkov_protocol._identity_hash_for.cache_info().currsize == 0
+
+
 class TestCrossLanguageCompatibility:
     """Ensures Python output matches known values (JS must produce the same)."""
 